@@ -1,12 +1,39 @@
 #!/usr/bin/env python3
-import configparser
 import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from operator import itemgetter
 from pathlib import Path
 import re
 
+# Number of INI files written concurrently
+MAX_WRITE_WORKERS = 32
+
+# CSV columns used to build each configuration, in unpacking order
+CSV_FIELDS = ('account', 'host', 'database', 'user', 'port', 'clusterid')
+REQUIRED_FIELDS = frozenset(CSV_FIELDS)
+
+# '%(name)s' references that configparser's interpolation accepts
+INTERPOLATION_RE = re.compile(r'%\(([^)]+)\)s')
+
 def validate_account(account):
     """Validate that account is exactly 12 digits."""
-    return re.fullmatch(r'^\d{12}$', account) is not None
+    return len(account) == 12 and account.isdecimal()
+
+def format_ini_value(value):
+    """Format an option value as configparser wrote it, rejecting what it rejected."""
+    if value is None:
+        raise TypeError("option values must be strings")
+    value = str(value)
+    
+    # Stray '%' would fail configparser's interpolation check
+    unescaped = INTERPOLATION_RE.sub('', value.replace('%%', ''))
+    if '%' in unescaped:
+        raise ValueError(f"invalid interpolation syntax in {value!r} at position {unescaped.find('%')}")
+    
+    # Embedded newlines become tab-indented continuation lines
+    return value.replace('\n', '\n\t')
 
 def generate_ini_file(output_path, config_data):
     """
@@ -15,24 +42,38 @@ def generate_ini_file(output_path, config_data):
     Args:
         output_path (str): Path to the output INI file
         config_data (dict): Dictionary containing configuration data
+    
+    Returns:
+        str: Path of the generated INI file
     """
-    config = configparser.ConfigParser()
+    # Fixed schema, so write the section directly in configparser's layout
+    values = {key: format_ini_value(value) for key, value in config_data.items()}
+    with open(output_path, 'w') as configfile:
+        configfile.write(
+            "[postgresql]\n"
+            f"account = {values['account']}\n"
+            f"host = {values['host']}\n"
+            f"database = {values['database']}\n"
+            f"user = {values['user']}\n"
+            f"port = {values['port']}\n"
+            f"clusterid = {values['clusterid']}\n"
+            "\n"
+        )
     
-    # Add the PostgreSQL section
-    config['postgresql'] = {
-        'account': config_data['account'],
-        'host': config_data['host'],
-        'database': config_data['database'],
-        'user': config_data['user'],
-        'port': config_data['port'],
-        'clusterid': config_data['clusterid']
-    }
+    return output_path
+
+def generate_ini_files(output_dir, configs):
+    """
+    Generate INI files one after another, in the given order.
     
-    # Write the configuration to file
-    with open(output_path, 'w') as configfile:
-        config.write(configfile)
+    Args:
+        output_dir (str): Directory to write the INI files to
+        configs (list): Configurations whose files must not be written concurrently
     
-    print(f"Generated: {output_path}")
+    Returns:
+        list: Paths of the generated INI files
+    """
+    return [generate_ini_file(f"{output_dir}/{config['clusterid']}.ini", config) for config in configs]
 
 def process_csv_file(csv_path):
     """
@@ -47,33 +88,52 @@ def process_csv_file(csv_path):
     configs = []
     
     with open(csv_path, mode='r', newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        
+        # An empty file has no header and no rows
+        if header is None:
+            return configs
+        
+        # Validate required fields once against the header
+        if not REQUIRED_FIELDS.issubset(header):
+            print("Missing required fields in CSV header. No rows processed.")
+            return configs
         
-        for row_num, row in enumerate(reader, start=1):
+        # Pick the required columns out of each row by position; a repeated
+        # column name resolves to its last occurrence, as csv.DictReader did
+        positions = {field: index for index, field in enumerate(header)}
+        get_fields = itemgetter(*(positions[field] for field in CSV_FIELDS))
+        row_width = len(header)
+        
+        # Blank lines are skipped and not counted, as csv.DictReader did
+        for row_num, row in enumerate(filter(None, reader), start=1):
             try:
-                # Validate required fields
-                if not all(field in row for field in ['account', 'host', 'database', 'user', 'port', 'clusterid']):
-                    print(f"Row {row_num}: Missing required fields. Skipping.")
-                    continue
+                # Missing trailing columns read as None, as csv.DictReader did
+                if len(row) < row_width:
+                    row += [None] * (row_width - len(row))
+                
+                account, host, database, user, port, clusterid = get_fields(row)
                 
                 # Validate account number
-                if not validate_account(row['account']):
+                if not validate_account(account):
                     print(f"Row {row_num}: Invalid account (must be 12 digits). Skipping.")
                     continue
                 
                 # Validate clusterid
-                if not row['clusterid'].strip():
+                clusterid = clusterid.strip()
+                if not clusterid:
                     print(f"Row {row_num}: Empty clusterid. Skipping.")
                     continue
                 
                 # Set defaults if empty
                 config = {
-                    'account': row['account'],
-                    'host': row['host'] or 'localhost',
-                    'database': row['database'],
-                    'user': row['user'],
-                    'port': row['port'] or '5432',
-                    'clusterid': row['clusterid'].strip()
+                    'account': account,
+                    'host': host or 'localhost',
+                    'database': database,
+                    'user': user,
+                    'port': port or '5432',
+                    'clusterid': clusterid
                 }
                 
                 configs.append(config)
@@ -99,10 +159,22 @@ def main():
         output_dir = Path("ini_output")
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        # Generate INI files for each configuration
+        # Plain strings are all open() needs; skip building a Path per file
+        out_dir_str = str(output_dir)
+        
+        # Rows whose clusterids may name the same file (exact repeats, or names
+        # differing only in case on a case-insensitive filesystem) go to one
+        # worker in CSV order, so the last row still wins and no file is
+        # written by two threads at once
+        batches = {}
         for config in configs:
-            output_file = output_dir / f"{config['clusterid']}.ini"
-            generate_ini_file(output_file, config)
+            batches.setdefault(os.path.normcase(config['clusterid']).casefold(), []).append(config)
+        
+        # Generate INI files concurrently
+        with ThreadPoolExecutor(max_workers=MAX_WRITE_WORKERS) as executor:
+            for output_files in executor.map(partial(generate_ini_files, out_dir_str), batches.values()):
+                for output_file in output_files:
+                    print(f"Generated: {output_file}")
         
         print(f"\nSuccessfully generated {len(configs)} INI files in '{output_dir}' directory.")
     
@@ -1,9 +1,10 @@
 import os
+import json
 import logging
-import psycopg2
+import time
 import boto3
 from botocore.exceptions import ClientError
-from psycopg2 import OperationalError
+from psycopg2 import OperationalError, pool
 from datetime import datetime
 
 # Initialize logger
@@ -14,10 +15,44 @@ logger.setLevel(logging.INFO)
 logs_client = boto3.client('logs')
 secrets_client = boto3.client('secretsmanager')
 
+# Throttling errors retried in-function before giving up
+RETRYABLE_ERROR_CODES = {'ThrottlingException', 'TooManyRequestsException'}
+MAX_CALL_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.05  # seconds, doubled after each attempt
+
+# SQLSTATEs for rejected credentials (invalid_authorization_specification,
+# invalid_password)
+AUTH_ERROR_CODES = {'28000', '28P01'}
+
+# Reused across warm invocations
+_SECRETS_CACHE = {}
+_DB_POOL = None
+_DB_POOL_PARAMS = None
+
 # Custom CloudWatch Log Group Configuration
 CUSTOM_LOG_GROUP = '/aws/custom/aurora-connectivity'
 LOG_STREAM_PREFIX = 'execution-'
 
+# PutLogEvents batch limits (per-event overhead counts towards the byte limit)
+MAX_LOG_BATCH_EVENTS = 10000
+MAX_LOG_BATCH_BYTES = 1048576
+LOG_EVENT_OVERHEAD_BYTES = 26
+
+# Log events waiting to be sent to the custom log stream
+_LOG_BUFFER = []
+_LOG_BUFFER_BYTES = 0
+
+def call_with_retry(func, **kwargs):
+    """Call a boto3 client method, backing off on throttling errors"""
+    for attempt in range(MAX_CALL_ATTEMPTS):
+        try:
+            return func(**kwargs)
+        except ClientError as e:
+            if (e.response['Error']['Code'] not in RETRYABLE_ERROR_CODES
+                    or attempt == MAX_CALL_ATTEMPTS - 1):
+                raise
+            time.sleep(RETRY_BASE_DELAY * 2 ** attempt)
+
 def create_custom_log_stream():
     """Create a custom log stream in CloudWatch"""
     try:
@@ -41,39 +76,63 @@ def create_custom_log_stream():
         )
         return log_stream_name
     except Exception as e:
-        logger.error(f"Failed to create custom log stream: {str(e)}")
+        logger.error("Failed to create custom log stream: %s", e)
         return None
 
 def log_to_custom_cloudwatch(message, level='INFO', log_stream_name=None):
-    """Log messages to custom CloudWatch log group"""
+    """Buffer a message for the custom CloudWatch log group"""
+    global _LOG_BUFFER_BYTES
     if not log_stream_name:
         return
         
-    try:
-        timestamp = int(datetime.now().timestamp() * 1000)
+    timestamp = time.time_ns() // 1_000_000
+    event_message = f"[{level}] {message}"
+    event_bytes = len(event_message.encode('utf-8')) + LOG_EVENT_OVERHEAD_BYTES
+    
+    # Send what we have so far if this event would exceed a batch limit
+    if (len(_LOG_BUFFER) >= MAX_LOG_BATCH_EVENTS
+            or _LOG_BUFFER_BYTES + event_bytes > MAX_LOG_BATCH_BYTES):
+        flush_custom_cloudwatch(log_stream_name)
+    
+    _LOG_BUFFER.append({
+        'timestamp': timestamp,
+        'message': event_message
+    })
+    _LOG_BUFFER_BYTES += event_bytes
+
+def flush_custom_cloudwatch(log_stream_name):
+    """Send all buffered messages to the custom CloudWatch log group"""
+    global _LOG_BUFFER_BYTES
+    if not log_stream_name or not _LOG_BUFFER:
+        return
         
-        logs_client.put_log_events(
+    try:
+        call_with_retry(
+            logs_client.put_log_events,
             logGroupName=CUSTOM_LOG_GROUP,
             logStreamName=log_stream_name,
-            logEvents=[
-                {
-                    'timestamp': timestamp,
-                    'message': f"[{level}] {message}"
-                }
-            ]
+            logEvents=sorted(_LOG_BUFFER, key=lambda event: event['timestamp'])
         )
     except Exception as e:
-        logger.error(f"Failed to write to custom CloudWatch: {str(e)}")
+        logger.error("Failed to write to custom CloudWatch: %s", e)
+    finally:
+        # Never carry events over into the next invocation
+        _LOG_BUFFER.clear()
+        _LOG_BUFFER_BYTES = 0
 
 def get_db_secrets(secret_name):
     """Retrieve database credentials from AWS Secrets Manager"""
+    if secret_name in _SECRETS_CACHE:
+        return _SECRETS_CACHE[secret_name]
+        
     try:
-        logger.info(f"Retrieving secrets for: {secret_name}")
-        response = secrets_client.get_secret_value(SecretId=secret_name)
+        logger.info("Retrieving secrets for: %s", secret_name)
+        response = call_with_retry(secrets_client.get_secret_value, SecretId=secret_name)
         
         if 'SecretString' in response:
-            secrets = eval(response['SecretString'])
+            secrets = json.loads(response['SecretString'])
             logger.info("Successfully retrieved database secrets")
+            _SECRETS_CACHE[secret_name] = secrets
             return secrets
         else:
             raise Exception("Secret binary not supported")
@@ -88,8 +147,47 @@ def get_db_secrets(secret_name):
         logger.error(error_msg)
         raise Exception(error_msg)
 
-def test_db_connection(db_params, log_stream_name):
+def get_db_params(secrets):
+    """Build psycopg2 connection parameters from the database secrets"""
+    return {
+        'host': secrets['host'],
+        'port': secrets.get('port', '5432'),
+        'database': secrets['dbname'],
+        'user': secrets['username'],
+        'password': secrets['password'],
+        'connect_timeout': 5,  # 5 seconds connection timeout
+        # Keep the pooled connection alive between warm invocations
+        'keepalives': 1,
+        'keepalives_idle': 30,
+        'keepalives_interval': 10
+    }
+
+def get_db_pool(db_params):
+    """Return the database connection pool, creating it on first use"""
+    global _DB_POOL, _DB_POOL_PARAMS
+    if _DB_POOL is None or _DB_POOL.closed or _DB_POOL_PARAMS != db_params:
+        if _DB_POOL is not None and not _DB_POOL.closed:
+            _DB_POOL.closeall()
+        _DB_POOL = pool.SimpleConnectionPool(1, 1, **db_params)
+        _DB_POOL_PARAMS = db_params
+    return _DB_POOL
+
+def invalidate_db_credentials(secret_name):
+    """Forget cached secrets and pooled connections, e.g. after a rotation"""
+    global _DB_POOL, _DB_POOL_PARAMS
+    _SECRETS_CACHE.pop(secret_name, None)
+    if _DB_POOL is not None and not _DB_POOL.closed:
+        _DB_POOL.closeall()
+    _DB_POOL = None
+    _DB_POOL_PARAMS = None
+
+def is_auth_error(error):
+    """Check whether an OperationalError means the credentials were rejected"""
+    return error.pgcode in AUTH_ERROR_CODES or 'authentication failed' in str(error)
+
+def test_db_connection(db_params, log_stream_name, retry=True):
     """Test the database connection with provided parameters"""
+    db_pool = None
     connection = None
     test_record = None
     try:
@@ -97,74 +195,80 @@ def test_db_connection(db_params, log_stream_name):
         logger.info(log_msg)
         log_to_custom_cloudwatch(log_msg, 'INFO', log_stream_name)
         
-        connection = psycopg2.connect(**db_params)
+        db_pool = get_db_pool(db_params)
+        connection = db_pool.getconn()
         
         with connection.cursor() as cursor:
-            # Test basic query
-            cursor.execute("SELECT version();")
-            db_version = cursor.fetchone()
-            version_msg = f"Database version: {db_version[0]}"
-            logger.info(version_msg)
-            log_to_custom_cloudwatch(version_msg, 'INFO', log_stream_name)
-            
-            # Create test table
+            # Create the test table and insert a test record in a single
+            # round-trip; the server version rides along on the returned row
             cursor.execute("""
                 CREATE TEMP TABLE IF NOT EXISTS lambda_test (
                     id serial PRIMARY KEY, 
                     timestamp timestamp,
                     test_value text
                 );
-            """)
-            
-            # Insert test record
-            cursor.execute("""
                 INSERT INTO lambda_test (timestamp, test_value) 
                 VALUES (current_timestamp, 'Lambda connectivity test') 
-                RETURNING id, timestamp, test_value;
+                RETURNING id, timestamp, test_value, version();
             """)
-            test_record = cursor.fetchone()
+            inserted_row = cursor.fetchone()
+            test_record = inserted_row[:3]
+            db_version = inserted_row[3]
+            
+            version_msg = f"Database version: {db_version}"
+            logger.info(version_msg)
+            log_to_custom_cloudwatch(version_msg, 'INFO', log_stream_name)
+            
             record_msg = f"Test record inserted: {test_record}"
             logger.info(record_msg)
             log_to_custom_cloudwatch(record_msg, 'INFO', log_stream_name)
             
-            # Verify the record exists
-            cursor.execute("SELECT * FROM lambda_test WHERE id = %s;", (test_record[0],))
-            verify_record = cursor.fetchone()
-            verify_msg = f"Record verification: {verify_record}"
-            logger.info(verify_msg)
-            log_to_custom_cloudwatch(verify_msg, 'INFO', log_stream_name)
-            
-            # Delete the test record
+            # Delete the test record; verifying the deletion costs another
+            # statement, so only do it when debugging
             if test_record:
-                cursor.execute("DELETE FROM lambda_test WHERE id = %s;", (test_record[0],))
+                if logger.isEnabledFor(logging.DEBUG):
+                    cursor.execute("""
+                        DELETE FROM lambda_test WHERE id = %(id)s;
+                        SELECT * FROM lambda_test WHERE id = %(id)s;
+                    """, {'id': test_record[0]})
+                    verify_deletion = cursor.fetchone()
+                    if not verify_deletion:
+                        logger.info("Record successfully deleted")
+                    else:
+                        logger.warning("Record still exists after deletion")
+                else:
+                    cursor.execute("DELETE FROM lambda_test WHERE id = %s;", (test_record[0],))
+                
                 delete_msg = f"Deleted test record with ID: {test_record[0]}"
                 logger.info(delete_msg)
                 log_to_custom_cloudwatch(delete_msg, 'INFO', log_stream_name)
-                
-                # Verify deletion
-                cursor.execute("SELECT * FROM lambda_test WHERE id = %s;", (test_record[0],))
-                verify_deletion = cursor.fetchone()
-                if not verify_deletion:
-                    logger.info("Record successfully deleted")
-                else:
-                    logger.warning("Record still exists after deletion")
             
             connection.commit()
             
             return {
                 'status': 'success',
-                'version': db_version[0],
+                'version': db_version,
                 'test_record': test_record,
                 'deleted_record_id': test_record[0] if test_record else None
             }
             
     except OperationalError as e:
+        # A reused pooled connection may have gone stale between invocations;
+        # discard it and retry once on a fresh one
+        if connection:
+            db_pool.putconn(connection, close=True)
+            connection = None
+            if retry:
+                logger.warning("Database connection lost, reconnecting: %s", e)
+                return test_db_connection(db_params, log_stream_name, retry=False)
+        
         error_msg = f"Database connection failed: {str(e)}"
         logger.error(error_msg)
         log_to_custom_cloudwatch(error_msg, 'ERROR', log_stream_name)
         return {
             'status': 'failed',
-            'error': error_msg
+            'error': error_msg,
+            'auth_failed': is_auth_error(e)
         }
     except Exception as e:
         error_msg = f"Database operation failed: {str(e)}"
@@ -176,8 +280,9 @@ def test_db_connection(db_params, log_stream_name):
         }
     finally:
         if connection:
-            connection.close()
-            logger.info("Database connection closed")
+            # The pool rolls back or discards the connection as needed
+            db_pool.putconn(connection)
+            logger.info("Database connection returned to pool")
 
 def lambda_handler(event, context):
     # Create custom log stream
@@ -190,20 +295,23 @@ def lambda_handler(event, context):
         # Retrieve database credentials from Secrets Manager
         secrets = get_db_secrets(secret_name)
         
-        # Prepare connection parameters
-        db_params = {
-            'host': secrets['host'],
-            'port': secrets.get('port', '5432'),
-            'database': secrets['dbname'],
-            'user': secrets['username'],
-            'password': secrets['password'],
-            'connect_timeout': 5  # 5 seconds connection timeout
-        }
-        
         # Test the connection
-        result = test_db_connection(db_params, log_stream_name)
+        result = test_db_connection(get_db_params(secrets), log_stream_name)
+        
+        # Cached credentials may be stale after a secret rotation; refetch
+        # them and try again only if they actually changed
+        if result.get('auth_failed'):
+            invalidate_db_credentials(secret_name)
+            fresh_secrets = get_db_secrets(secret_name)
+            if fresh_secrets != secrets:
+                logger.warning("Database credentials changed, retrying with refreshed secret")
+                result = test_db_connection(get_db_params(fresh_secrets), log_stream_name)
         
         if result['status'] == 'success':
+            # Serialise the timestamp here so the response is plain JSON
+            record_id, record_timestamp, record_value = result['test_record']
+            test_record = [record_id, record_timestamp.isoformat(), record_value]
+            
             success_msg = "Successfully connected to and tested Aurora PostgreSQL"
             logger.info(success_msg)
             log_to_custom_cloudwatch(success_msg, 'INFO', log_stream_name)
@@ -213,7 +321,7 @@ def lambda_handler(event, context):
                 'body': {
                     'message': success_msg,
                     'version': result['version'],
-                    'test_record_inserted': result['test_record'],
+                    'test_record_inserted': test_record,
                     'deleted_record_id': result['deleted_record_id'],
                     'log_stream': log_stream_name
                 }
@@ -242,3 +350,5 @@ def lambda_handler(event, context):
                 'log_stream': log_stream_name
             }
         }
+    finally:
+        flush_custom_cloudwatch(log_stream_name)
@@ -1,48 +1,58 @@
 import os
 import logging
-import psycopg2
-from psycopg2 import OperationalError
+from psycopg2 import OperationalError, pool
 
 # Initialize logger
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-def lambda_handler(event, context):
-    # Database connection parameters from environment variables
-    db_params = {
-        'host': os.environ['DB_HOST'],
-        'port': os.environ.get('DB_PORT', '5432'),
-        'database': os.environ['DB_NAME'],
-        'user': os.environ['DB_USER'],
-        'password': os.environ['DB_PASSWORD']
-    }
-    
-    logger.info(f"Attempting to connect to database at {db_params['host']}")
-    
+# Reused across warm invocations
+_DB_POOL = None
+
+def get_db_pool(db_params):
+    """Return the database connection pool, creating it on first use"""
+    global _DB_POOL
+    if _DB_POOL is None or _DB_POOL.closed:
+        _DB_POOL = pool.SimpleConnectionPool(1, 1, **db_params)
+    return _DB_POOL
+
+def check_db_connection(db_params, retry=True):
+    """Run the heartbeat queries on the pooled database connection"""
+    db_pool = None
     connection = None
     try:
-        # Attempt to establish a connection
-        connection = psycopg2.connect(**db_params)
+        # Attempt to establish a connection, reusing the pooled one when warm
+        db_pool = get_db_pool(db_params)
+        connection = db_pool.getconn()
         
         # Test the connection with a simple query
         with connection.cursor() as cursor:
             cursor.execute("SELECT version();")
             db_version = cursor.fetchone()
-            logger.info(f"Successfully connected to PostgreSQL. Version: {db_version[0]}")
+            logger.info("Successfully connected to PostgreSQL. Version: %s", db_version[0])
             
             # Additional test query to verify database operations
             cursor.execute("SELECT current_timestamp;")
             current_time = cursor.fetchone()
-            logger.info(f"Database current timestamp: {current_time[0]}")
+            logger.info("Database current timestamp: %s", current_time[0])
             
         return {
             'statusCode': 200,
             'body': 'Successfully connected to Aurora PostgreSQL',
             'version': db_version[0],
-            'timestamp': str(current_time[0])
+            'timestamp': current_time[0].isoformat()
         }
         
     except OperationalError as e:
+        # A reused pooled connection may have gone stale between invocations;
+        # discard it and retry once on a fresh one
+        if connection:
+            db_pool.putconn(connection, close=True)
+            connection = None
+            if retry:
+                logger.warning("Database connection lost, reconnecting: %s", e)
+                return check_db_connection(db_params, retry=False)
+        
         error_msg = f"Connection failed: {str(e)}"
         logger.error(error_msg)
         return {
@@ -58,5 +68,24 @@ def lambda_handler(event, context):
         }
     finally:
         if connection:
-            connection.close()
-            logger.info("Database connection closed")
\ No newline at end of file
+            # The pool rolls back or discards the connection as needed
+            db_pool.putconn(connection)
+            logger.info("Database connection returned to pool")
+
+def lambda_handler(event, context):
+    # Database connection parameters from environment variables
+    db_params = {
+        'host': os.environ['DB_HOST'],
+        'port': os.environ.get('DB_PORT', '5432'),
+        'database': os.environ['DB_NAME'],
+        'user': os.environ['DB_USER'],
+        'password': os.environ['DB_PASSWORD'],
+        # Keep the pooled connection alive between warm invocations
+        'keepalives': 1,
+        'keepalives_idle': 30,
+        'keepalives_interval': 10
+    }
+    
+    logger.info("Attempting to connect to database at %s", db_params['host'])
+    
+    return check_db_connection(db_params)
@@ -1,7 +1,25 @@
 #!/usr/bin/env python3
 import argparse
-import configparser
+from configparser import DuplicateOptionError
 from pathlib import Path
+import re
+
+# '%(name)s' references that configparser's interpolation accepts
+INTERPOLATION_RE = re.compile(r'%\(([^)]+)\)s')
+
+def format_ini_value(value):
+    """Format an option value as configparser wrote it, rejecting what it rejected."""
+    if value is None:
+        raise TypeError("option values must be strings")
+    value = str(value)
+    
+    # Stray '%' would fail configparser's interpolation check
+    unescaped = INTERPOLATION_RE.sub('', value.replace('%%', ''))
+    if '%' in unescaped:
+        raise ValueError(f"invalid interpolation syntax in {value!r} at position {unescaped.find('%')}")
+    
+    # Embedded newlines become tab-indented continuation lines
+    return value.replace('\n', '\n\t')
 
 def generate_ini_file(output_path, sections):
     """
@@ -12,13 +30,25 @@ def generate_ini_file(output_path, sections):
         sections (dict): Dictionary containing section names as keys and 
                          dictionaries of key-value pairs as values
     """
-    config = configparser.ConfigParser()
+    lines = []
     
-    for section_name, options in sections.items():
-        config[section_name] = options
+    # Keep configparser's layout: DEFAULT first and only when it has options,
+    # lower-cased keys, and the same errors for keys or values it refused
+    for section_name, options in sorted(sections.items(), key=lambda item: item[0] != 'DEFAULT'):
+        if section_name == 'DEFAULT' and not options:
+            continue
+        lines.append(f"[{section_name}]\n")
+        seen_keys = set()
+        for key, value in options.items():
+            key = key.lower()
+            if key in seen_keys:
+                raise DuplicateOptionError(section_name, key, '<dict>')
+            seen_keys.add(key)
+            lines.append(f"{key} = {format_ini_value(value)}\n")
+        lines.append("\n")
     
     with open(output_path, 'w') as configfile:
-        config.write(configfile)
+        configfile.writelines(lines)
     
     print(f"INI file successfully generated at: {output_path}")
 